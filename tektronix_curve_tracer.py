@@ -0,0 +1,935 @@
+import bisect
+import logging
+import re
+import time
+from contextlib import contextmanager
+import numpy as np
+
+__all__ = ["TektronixCurveTracer", "RangeAutoScaler"]
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class TektronixCurveTracer:
+    """ Represents a generic Tektronix Curve Tracer
+    and provides a high-level interface for interacting with
+    the instrument using the SCPI command set.
+
+    .. code-block:: python
+
+    tct = TektronixCurveTracer(Tektronix371A("GPIB0::23::INSTR"))
+
+    tct.initialize()
+
+    """
+
+    VALID_PEAK_POWER_ORDERED = (300, 3000)
+    VALID_PEAK_POWER = frozenset(VALID_PEAK_POWER_ORDERED)
+    N_HORIZONTAL_DIVS = 10
+    N_VERTICAL_DIVS = 10
+
+    STEPGEN_MIN_OFFSET = 0.0
+    STEPGEN_MAX_NUMBER_STEPS = 5
+    STEPGEN_OFFSET_RESOLUTION = 0.01
+
+    COLLECTOR_SUPPLY_RESOLUTION = 0.1
+
+    # delays (s) given to the instrument to apply a setting change or an initialization
+    SETTLING_TIME = 0.5
+    INITIALIZE_SETTLING_TIME = 2
+
+    VISA_TIMEOUT = 5000  # ms
+    VISA_TERMINATION = "\n"
+    VISA_CHUNK_SIZE = 1 << 20  # bytes, holds a whole curve in a single read
+    # LAN device names of the VXI-11 TCPIP INSTR resources
+    VXI11_DEVICE_NAME = re.compile(r"INST\d+|GPIB\d*,\d+")
+
+    # property holding the source and table holding the valid selections for every kind
+    VALID_SELECTIONS_TABLES = {
+        "horizontal": ("display_horizontal_source_sensitivity",
+                       "HORIZONTAL_DISPLAY_SENSITIVITY_VALID_SELECTIONS_VS_PEAKPOWER_FOR_SOURCE"),
+        "vertical": ("display_vertical_source_sensitivity",
+                     "VERTICAL_DISPLAY_SENSITIVITY_VALID_SELECTIONS_VS_PEAKPOWER_FOR_SOURCE"),
+        "stepgen": ("stepgen_step_source_and_size",
+                    "STEP_GENERATOR_VALID_STEP_SELECTIONS_FOR_STEP_SOURCE"),
+    }
+
+    # properties written even if the local state already holds the value, setting the measure
+    # mode triggers the measurement
+    ALWAYS_WRITTEN_PROPERTIES = frozenset({"measure_mode"})
+
+    # settings written by _apply_config, in order. The values set to None are given by the caller
+    CONFIGS = {
+        "initialize": {
+            # COLLECTOR SUPPLY
+            "cs_peakpower": 300,
+            "cs_polarity": "POS",
+            "cs_collector_supply": 0,
+            # STEP GEN
+            "stepgen_step_source_and_size": ("VOLTAGE", 5.0),
+            "stepgen_number_steps": 0,
+            "stepgen_offset": 0,
+            # DISPLAY
+            "diplay_store_mode": "STO",
+            "display_horizontal_source_sensitivity": ("COLLECT", 1.0E-1),
+            "display_vertical_source_sensitivity": ("COLLECT", 500.0E-3),
+            "cursor": ("DOT", 1),
+            # MEASUREMENT
+            "measure_mode": "REP",
+        },
+        "3Q": {
+            # COLLECTOR SUPPLY
+            "cs_peakpower": None,
+            "cs_polarity": "NEG",
+            "cs_collector_supply": 0,
+            # STEP GEN
+            "stepgen_step_source_and_size": ("VOLTAGE", 5.0),
+            "stepgen_number_steps": 0,
+            "stepgen_offset": None,
+            # DISPLAY
+            "diplay_store_mode": "STO",
+            "display_horizontal_source_sensitivity": None,
+            "display_vertical_source_sensitivity": None,
+            "cursor": ("DOT", 1),
+            # MEASUREMENT
+            "measure_mode": "REP",
+        },
+        "output_characteristics": {
+            # COLLECTOR SUPPLY
+            "cs_peakpower": None,
+            "cs_polarity": "POS",
+            "cs_collector_supply": 0,
+            # STEP GEN
+            "stepgen_step_source_and_size": ("VOLTAGE", 5.0),
+            "stepgen_number_steps": 0,
+            "stepgen_offset": None,
+            # DISPLAY
+            "diplay_store_mode": "STO",
+            "display_horizontal_source_sensitivity": None,
+            "display_vertical_source_sensitivity": None,
+            "cursor": ("DOT", 1),
+            # MEASUREMENT
+            "measure_mode": "REP",
+        },
+        "transfer_characteristics": {
+            # STEP GEN
+            "stepgen_step_source_and_size": ("VOLTAGE", 5.0),
+            "stepgen_number_steps": 0,
+            "stepgen_offset": None,
+            # COLLECTOR SUPPLY
+            "cs_peakpower": None,
+            "cs_polarity": "POS",
+            "cs_collector_supply": None,
+            # DISPLAY
+            "diplay_store_mode": "STO",
+            "display_horizontal_source_sensitivity": None,
+            "display_vertical_source_sensitivity": None,
+            "cursor": ("DOT", 1),
+            # MEASUREMENT
+            "measure_mode": "REP",
+        },
+    }
+
+    # limits checked before writing the property, the raw commands sent inside staged_writes do not
+    # go through the validators of the driver setters
+    VALID_RANGES = {
+        # % of the maximum collector supply
+        "cs_collector_supply": (0, 100),
+    }
+
+    # 371A command for every mirrored property and for the other commands sent by this class.
+    # Every raw write goes through this table (see _command), so it is the single place to change a mnemonic
+    COMMANDS = {
+        # COLLECTOR SUPPLY
+        "cs_peakpower": "PKPOWER {0}",
+        "cs_polarity": "CSPOL {0}",
+        "cs_collector_supply": "VCSPPK {0:.3E}",
+        # STEP GEN
+        "stepgen_step_source_and_size": "STPGEN {0}:{1:.3E}",
+        "stepgen_number_steps": "STPGEN NUMBER:{0}",
+        # 4 significant digits keep the STEPGEN_OFFSET_RESOLUTION (0.01) for every offset below 100,
+        # the offset spans up to 10 steps of the step size, far below that
+        "stepgen_offset": "STPGEN OFFSET:{0:.3E}",
+        # DISPLAY
+        "diplay_store_mode": "DISPLAY {0}",
+        "display_horizontal_source_sensitivity": "HORIZ {0}:{1:.3E}",
+        "display_vertical_source_sensitivity": "VERT {0}:{1:.3E}",
+        "cursor": "CURSOR {0}:{1}",
+        "cursor_readouts": "READOUT?",
+        # MEASUREMENT
+        "measure_mode": "MEASURE {0}",
+    }
+
+    def __init__(self, concrete_tek_ct):
+        """
+        :param concrete_tek_ct: the connected driver instance (pymeasure Tektronix371A), the session
+        is configured on it right away
+        """
+        self.concrete_tek_ct = concrete_tek_ct
+        # local mirror of the instrument settings written through this class, avoids
+        # querying the instrument before every change
+        self._state = {}
+        # valid selections (sensitivities, step sizes) per (kind, source, peak power)
+        self._valid_selections = {}
+        self._valid_selection_indexes = {}
+        # ready to send command per valid selection
+        self._valid_selection_commands = {}
+        # writes waiting to be sent as a single compound message, see staged_writes
+        self._pending_writes = []
+        self._staging = False
+        self.configure_session()
+
+    def initialize(self):
+        """
+        initializes the instrument and sends the default configuration (CONFIGS["initialize"]) as
+        a single compound message (fragments separated by ';') instead of one write per setting.
+        Transports that do not support command batching get one write per setting.
+        :return: None
+        """
+        self.flush()
+        self.concrete_tek_ct.initialize()
+        # the instrument must finish the initialization before taking the configuration
+        self.wait_for_settling(self.INITIALIZE_SETTLING_TIME)
+        self._state.clear()
+        self._apply_config(self.CONFIGS["initialize"])
+
+    def initialize_per_3Q_measure(self,
+                                  peakpower=3000,
+                                  step_gen_offset=0,
+                                  vertical_sens=2.0,
+                                  horizontal_sens=0.5):
+        self._apply_config({**self.CONFIGS["3Q"],
+                            "cs_peakpower": peakpower,
+                            "stepgen_offset": step_gen_offset,
+                            "display_horizontal_source_sensitivity": ("COLLECT", horizontal_sens),
+                            "display_vertical_source_sensitivity": ("COLLECT", vertical_sens)})
+
+    def initialize_per_output_characteristics_measure(self,
+                                                      peakpower=3000,
+                                                      step_gen_offset=0,
+                                                      vertical_sens=2.0,
+                                                      horizontal_sens=0.5):
+        self._apply_config({**self.CONFIGS["output_characteristics"],
+                            "cs_peakpower": peakpower,
+                            "stepgen_offset": step_gen_offset,
+                            "display_horizontal_source_sensitivity": ("COLLECT", horizontal_sens),
+                            "display_vertical_source_sensitivity": ("COLLECT", vertical_sens)})
+
+    def initialize_per_transfer_characteristics_measure(self,
+                                                        peakpower=3000,
+                                                        collector_supply=66.6,
+                                                        step_gen_offset=0,
+                                                        vertical_sens=2.0,
+                                                        horizontal_sens=1.0):
+        self._apply_config({**self.CONFIGS["transfer_characteristics"],
+                            "cs_peakpower": peakpower,
+                            "cs_collector_supply": collector_supply,
+                            "stepgen_offset": step_gen_offset,
+                            "display_horizontal_source_sensitivity": ("STP", horizontal_sens),
+                            "display_vertical_source_sensitivity": ("COLLECT", vertical_sens)})
+
+    def _apply_config(self, config):
+        """
+        writes the settings of config, in order, as a single compound message (see staged_writes).
+        Settings already held by the instrument are skipped.
+        :param config: property name -> value, the "cursor" entry holds the (mode, index) of the cursor
+        :return: None
+        """
+        with self.staged_writes():
+            for name, value in config.items():
+                if name == "cursor":
+                    self._set_cursor_mode(*value)
+                else:
+                    self._set_property(name, value)
+
+    def _command(self, name, *args):
+        """
+        :param name: key of the command in COMMANDS
+        :param args: values for the fields of the command. The numeric fields of the templates are
+        sent in NR3 format (i.e. 1.000E-06) whatever the type of the value, int or float
+        :return: the command ready to be sent
+        """
+        return self.COMMANDS[name].format(*args)
+
+    @contextmanager
+    def staged_writes(self):
+        """
+        keeps the settings written inside the with block in a buffer and sends them as a single
+        compound message when the block ends, or before, if something has to be read from the
+        instrument.
+
+        .. code-block:: python
+
+        with tct.staged_writes():
+            tct.set_stepgen_step_size(5)
+            tct.set_stepgen_offset(10)
+
+        """
+        previous_staging = self._staging
+        self._staging = self.is_command_batching_supported()
+        try:
+            yield
+        finally:
+            self._staging = previous_staging
+            if not self._staging:
+                self.flush()
+
+    def flush(self):
+        """
+        sends the staged writes, if any, as a single compound message
+        :return: None
+        """
+        if self._pending_writes:
+            fragments = self._pending_writes
+            self._pending_writes = []
+            self.concrete_tek_ct.write(";".join(fragments))
+
+    def configure_session(self):
+        """
+        configures the VISA session of the concrete curve tracer (terminations, EOI, read chunk
+        size and timeout) so every following write and query uses the same, already opened, session.
+        :return: None
+        """
+        connection = self.concrete_tek_ct.adapter.connection
+        connection.write_termination = self.VISA_TERMINATION
+        connection.read_termination = self.VISA_TERMINATION
+        connection.send_end = True
+        connection.chunk_size = self.VISA_CHUNK_SIZE
+        connection.timeout = self.VISA_TIMEOUT
+
+    def shutdown(self):
+        """
+        leaves the instrument in a safe state: collector supply and step generator offset at zero
+        and all the events disabled.
+        :return: None
+        """
+        self.reset_collector_supply()
+        self.reset_stepgen_offset()
+        self.flush()
+        self.concrete_tek_ct.discard_and_disable_all_events()
+
+    def is_command_batching_supported(self):
+        """
+        compound messages are not sent through VXI-11 sessions (TCPIP::host[::instN]::INSTR, or
+        TCPIP::host::gpibN,address::INSTR through a LAN/GPIB gateway), they fall back to one write per
+        command. HiSLIP (TCPIP::host::hislipN::INSTR), socket, GPIB and serial sessions batch them.
+        :return: True if the command batching is supported by the transport
+        """
+        connection = getattr(self.concrete_tek_ct.adapter, "connection", None)
+        parts = str(getattr(connection, "resource_name", "")).upper().split("::")
+        if not (parts[0].startswith("TCPIP") and parts[-1] == "INSTR"):
+            return True
+        # the LAN device name is optional, VXI-11 inst0 is the default one
+        lan_device_name = parts[2] if len(parts) > 3 else "INST0"
+        return not self.VXI11_DEVICE_NAME.fullmatch(lan_device_name)
+
+    def _get_property(self, name):
+        """
+        returns the value of the instrument property from the local state. The instrument is
+        only queried if the property has not been written or read before.
+        :param name: name of the property of the concrete curve tracer
+        :return: the value of the property
+        """
+        if name not in self._state:
+            self.flush()
+            self._state[name] = getattr(self.concrete_tek_ct, name)
+        return self._state[name]
+
+    def _set_property(self, name, value, force=False):
+        """
+        writes the instrument property and keeps its value in the local state. The write is
+        skipped if the local state already holds the value, unless force is True.
+        :param name: name of the property of the concrete curve tracer
+        :param value: the new value of the property
+        :param force: if True the value is written even if the local state already holds it. Use it
+        for the writes that must reach the instrument (i.e. safety resets), the settings can be
+        changed from the front panel without the local state knowing it.
+        :return: None
+        """
+        if (not force and name in self._state and self._state[name] == value
+                and name not in self.ALWAYS_WRITTEN_PROPERTIES):
+            return
+        if name in self.VALID_RANGES:
+            low, high = self.VALID_RANGES[name]
+            if not low <= value <= high:
+                raise ValueError(f"{name} must be between {low} and {high}")
+        if name in self.COMMANDS:
+            self._write_property(name, value,
+                                 self._command(name, *(value if isinstance(value, tuple) else (value,))))
+        else:
+            self.flush()
+            setattr(self.concrete_tek_ct, name, value)
+        self._state[name] = value
+
+    def _set_cursor_mode(self, mode, n):
+        if self._staging:
+            self._pending_writes.append(self._command("cursor", mode, n))
+        else:
+            self.flush()
+            self.concrete_tek_ct.set_cursor_mode(mode, n)
+
+    def _write_property(self, name, value, command):
+        """
+        inside staged_writes the raw command is buffered for the compound message, otherwise the
+        value goes through the setter of the concrete curve tracer, with its validators.
+        :param name: name of the property of the concrete curve tracer
+        :param value: the new value of the property
+        :param command: the command that sets value, as sent inside a compound message
+        :return: None
+        """
+        if self._staging:
+            self._pending_writes.append(command)
+        else:
+            self.flush()
+            setattr(self.concrete_tek_ct, name, value)
+
+    def _load_valid_selections(self, kind, source=None):
+        """
+        resolves, once per source and peak power, the valid selections of kind from the tables of
+        the concrete curve tracer. They are stored as a tuple together with a value -> index map
+        and a value -> command map with the commands already formatted.
+        :param kind: "horizontal", "vertical" or "stepgen"
+        :param source: the source of the selections, the actual one if None
+        :return: the key of the valid selections in the cache
+        """
+        source_property, table_name = self.VALID_SELECTIONS_TABLES[kind]
+        if source is None:
+            source = self._get_property(source_property)[0]
+        key = (kind, source, self.get_peak_power())
+        if key not in self._valid_selections:
+            selections = tuple(getattr(self.concrete_tek_ct, table_name)[source][key[2]])
+            self._valid_selections[key] = selections
+            self._valid_selection_indexes[key] = {value: index for index, value in enumerate(selections)}
+            self._valid_selection_commands[key] = {value: self._command(source_property, source, value)
+                                                   for value in selections}
+        return key
+
+    def _set_valid_selection(self, kind, value):
+        """
+        writes the precomputed command that selects value for kind, with the actual source.
+        :param kind: "horizontal", "vertical" or "stepgen"
+        :param value: sensitivity or step size
+        :return: None
+        """
+        key = self._load_valid_selections(kind)
+        command = self._valid_selection_commands[key].get(value)
+        if command is None:
+            raise ValueError(f"{kind} value must be one of the values:{self._valid_selections[key]}")
+        source_property = self.VALID_SELECTIONS_TABLES[kind][0]
+        if self._state.get(source_property) == (key[1], value):
+            return
+        self._write_property(source_property, (key[1], value), command)
+        self._state[source_property] = (key[1], value)
+
+    def _index_of_valid_selection(self, kind, value):
+        """
+        returns the position of value inside the valid selections of kind. Values not found
+        exactly (i.e. read back from the instrument with some rounding) map to the nearest
+        valid selection.
+        :param kind: "horizontal", "vertical" or "stepgen"
+        :param value: sensitivity or step size
+        :return: the index of the value inside the valid selections
+        """
+        key = self._load_valid_selections(kind)
+        index = self._valid_selection_indexes[key].get(value)
+        if index is None:
+            # the valid selections are sorted in ascending order
+            selections = self._valid_selections[key]
+            index = min(bisect.bisect_left(selections, value), len(selections) - 1)
+            if index > 0 and value - selections[index - 1] < selections[index] - value:
+                index = index - 1
+        return index
+
+    def _shifted_valid_selection(self, kind, value, shift):
+        """
+        :param kind: "horizontal", "vertical" or "stepgen"
+        :param value: sensitivity or step size
+        :param shift: number of positions to move inside the valid selections
+        :return: the valid selection shift positions away from value, None if that position is
+        out of the valid selections
+        """
+        selections = self._valid_selections[self._load_valid_selections(kind)]
+        new_index = self._index_of_valid_selection(kind, value) + shift
+        if 0 <= new_index < len(selections):
+            return selections[new_index]
+        return None
+
+    def resync(self):
+        """
+        queries again the instrument for every property held in the local state. Use it if the
+        instrument has been changed from the front panel or by another program.
+        :return: None
+        """
+        self.flush()
+        for name in list(self._state):
+            self._state[name] = getattr(self.concrete_tek_ct, name)
+
+    def get_peak_power(self):
+        return self._get_property("cs_peakpower")
+
+    def set_peak_power(self, pp):
+        if pp not in self.VALID_PEAK_POWER:
+            raise ValueError(f"Peak Power must be one of the values:{self.VALID_PEAK_POWER_ORDERED}")
+        else:
+            self._set_property("cs_peakpower", pp)
+
+    def reset_peak_power(self):
+        self.set_peak_power(self.VALID_PEAK_POWER_ORDERED[0])
+
+    def increase_peak_power(self):
+        self.set_peak_power(self.VALID_PEAK_POWER_ORDERED[1])
+
+    def decrease_peak_power(self):
+        self.set_peak_power(self.VALID_PEAK_POWER_ORDERED[0])
+
+    def get_collector_suplly(self):
+        return self._get_property("cs_collector_supply")
+
+    def set_collector_suplly(self, value):
+        self._set_property("cs_collector_supply", value)
+
+    def set_collector_suplly_and_wait(self, value):
+        """
+        sets the collector supply and gives the instrument SETTLING_TIME to apply it.
+        :param value: the new value (in %) of the collector supply
+        :return: None
+        """
+        self.set_collector_suplly(value)
+        self.wait_for_settling()
+
+    def change_collector_supply(self, increase=True, delta=COLLECTOR_SUPPLY_RESOLUTION, wait=False):
+        """
+        changes the actual value of the collector supply
+        :param increase: if increase is True then the collector supply will change in order to rise the
+        power applied to the DUT. Otherwise if False.
+        :param delta: is the variation or delta (in %) we want to vary the collector supply. Min
+        allowed increments of 0.1%
+        :param wait: if True gives the instrument SETTLING_TIME to apply the new value
+        :return: None
+        """
+        actual_cs = self.get_collector_suplly()
+        _delta = self.COLLECTOR_SUPPLY_RESOLUTION if delta < self.COLLECTOR_SUPPLY_RESOLUTION else abs(
+            delta)
+        if not increase:
+            _delta = - _delta
+        if wait:
+            self.set_collector_suplly_and_wait(actual_cs + _delta)
+        else:
+            self.set_collector_suplly(actual_cs + _delta)
+
+    def increase_collector_supply(self, delta=COLLECTOR_SUPPLY_RESOLUTION, wait=False):
+        self.change_collector_supply(increase=True, delta=delta, wait=wait)
+
+    def decrease_collector_supply(self, delta=COLLECTOR_SUPPLY_RESOLUTION, wait=False):
+        self.change_collector_supply(increase=False, delta=delta, wait=wait)
+
+    def find_collector_supply(self, limit_reached, start_step=1.0, max_step=2.0, resolution=1.0,
+                              max_collector_supply=100.0):
+        """
+        looks for the lowest collector supply at which the cursor readouts reach a limit. The
+        collector supply is raised with steps that double, up to max_step, while the limit is not
+        reached and then the last interval is bisected down to resolution. No setpoint is ever more
+        than max_step above the last one known to be under the limit, so the device never gets
+        much more than what the limit asks for.
+        :param limit_reached: function of (v_cursor, i_cursor) that returns True when the limit is reached
+        :param start_step: the first variation (in %) of the collector supply
+        :param max_step: the largest variation (in %) of the collector supply above the last setpoint
+        under the limit
+        :param resolution: the width (in %) of the interval where the search stops
+        :param max_collector_supply: the collector supply (in %) where the search stops if the limit is
+        not reached
+        :return: the (v_cursor, i_cursor) readouts at the collector supply found
+        """
+        low = self.get_collector_suplly()
+        high = None
+        step = min(start_step, max_step)
+        while high is None:
+            collector_supply = round(min(low + step, max_collector_supply), 1)
+            self.set_collector_suplly_and_wait(collector_supply)
+            readouts = self.read_cursors()
+            if limit_reached(*readouts):
+                high = collector_supply
+            elif collector_supply >= max_collector_supply:
+                return readouts
+            else:
+                low = collector_supply
+                step = min(step * 2, max_step)
+
+        high_readouts = readouts
+        while high - low > resolution:
+            collector_supply = round((low + high) / 2, 1)
+            self.set_collector_suplly_and_wait(collector_supply)
+            readouts = self.read_cursors()
+            if limit_reached(*readouts):
+                high = collector_supply
+                high_readouts = readouts
+            else:
+                low = collector_supply
+
+        if self.get_collector_suplly() != high:
+            self.set_collector_suplly_and_wait(high)
+            high_readouts = self.read_cursors()
+        return high_readouts
+
+    def reset_collector_supply(self):
+        # always written, the collector supply can be raised from the front panel
+        self._set_property("cs_collector_supply", 0.0, force=True)
+
+    def reset_horizontal_sensitivity(self):
+        horizontal_sensitivities = self.get_valid_horizontal_sensitivities()
+        self.set_horizontal_sensitivity(horizontal_sensitivities[0])
+
+    def set_horizontal_sensitivity(self, sensitivity):
+        self._set_valid_selection("horizontal", sensitivity)
+
+    def get_horizontal_sensitivity(self):
+        return self._get_property("display_horizontal_source_sensitivity")[1]
+
+    def change_horizontal_sensitivity(self, increase=True):
+        """
+        changes the actual value of the horizontal sensitivity
+        :param increase: if increase is True then the horizontal sensitivity will change in order to reduce the
+        volts/div. If False the will change will change in order to raise the volts/div.
+        :return: None
+        """
+        new_sensitivity = self._shifted_valid_selection("horizontal",
+                                                        self.get_horizontal_sensitivity(),
+                                                        -1 if increase else 1)
+        if new_sensitivity is not None:
+            self.set_horizontal_sensitivity(new_sensitivity)
+
+    def increase_horizontal_sensitivity(self):
+        self.change_horizontal_sensitivity(increase=True)
+
+    def decrease_horizontal_sensitivity(self):
+        self.change_horizontal_sensitivity(increase=False)
+
+    def get_valid_horizontal_sensitivities(self):
+        return self._valid_selections[self._load_valid_selections("horizontal")]
+
+    def get_horizontal_range(self):
+        return self.get_horizontal_sensitivity() * self.N_HORIZONTAL_DIVS
+
+    def reset_horizontal_range(self):
+        self.reset_horizontal_sensitivity()
+
+    def increase_horizontal_range(self):
+        self.decrease_horizontal_sensitivity()
+
+    def decrease_horizontal_range(self):
+        self.increase_horizontal_sensitivity()
+
+    def set_horizontal_and_vertical_sensitivity(self, h_sensitivity, v_sensitivity):
+        """
+        sets both display sensitivities with a single compound message
+        :param h_sensitivity: the new horizontal sensitivity
+        :param v_sensitivity: the new vertical sensitivity
+        :return: None
+        """
+        with self.staged_writes():
+            self.set_horizontal_sensitivity(h_sensitivity)
+            self.set_vertical_sensitivity(v_sensitivity)
+
+    def reset_vertical_sensitivity(self):
+        vertical_sensitivities = self.get_valid_vertical_sensitivities()
+        self.set_vertical_sensitivity(vertical_sensitivities[0])
+
+    def set_vertical_sensitivity(self, sensitivity):
+        self._set_valid_selection("vertical", sensitivity)
+
+    def get_vertical_sensitivity(self):
+        return self._get_property("display_vertical_source_sensitivity")[1]
+
+    def change_vertical_sensitivity(self, increase=True):
+        """
+        changes the actual value of the vertical sensitivity
+        :param increase: if increase is True then the vertical sensitivity will change in order to reduce the
+        amps/div. If False the will change will change in order to raise the amps/div.
+        :return: None
+        """
+        new_sensitivity = self._shifted_valid_selection("vertical",
+                                                        self.get_vertical_sensitivity(),
+                                                        -1 if increase else 1)
+        if new_sensitivity is not None:
+            self.set_vertical_sensitivity(new_sensitivity)
+
+    def increase_vertical_sensitivity(self):
+        self.change_vertical_sensitivity(increase=True)
+
+    def decrease_vertical_sensitivity(self):
+        self.change_vertical_sensitivity(increase=False)
+
+    def get_valid_vertical_sensitivities(self):
+        return self._valid_selections[self._load_valid_selections("vertical")]
+
+    def get_vertical_range(self):
+        return self.get_vertical_sensitivity() * self.N_VERTICAL_DIVS
+
+    def reset_vertical_range(self):
+        self.reset_vertical_sensitivity()
+
+    def increase_vertical_range(self):
+        self.decrease_vertical_sensitivity()
+
+    def decrease_vertical_range(self):
+        self.increase_vertical_sensitivity()
+
+    def reset_number_of_steps(self):
+        self.set_number_of_steps(0)
+
+    def set_number_of_steps(self, n_steps):
+        if not 0 <= n_steps <= self.STEPGEN_MAX_NUMBER_STEPS:
+            raise ValueError(f"Number of steps must be between 0 and {self.STEPGEN_MAX_NUMBER_STEPS}")
+        self._set_property("stepgen_number_steps", n_steps)
+
+    def get_number_of_steps(self):
+        return self._get_property("stepgen_number_steps")
+
+    def change_number_of_steps(self, increase=True):
+        """
+        changes the actual value of the number of steps in the step generator
+        :param increase: if increase is True then the number of steps in the step generator will raise by one.
+        Otherwise will decrease by one.
+        :return: None
+        """
+        n_steps = self.get_number_of_steps() + (1 if increase else -1)
+        if 0 <= n_steps <= self.STEPGEN_MAX_NUMBER_STEPS:
+            self.set_number_of_steps(n_steps)
+
+    def increase_number_of_steps(self):
+        self.change_number_of_steps(increase=True)
+
+    def decrease_number_of_steps(self):
+        self.change_number_of_steps(increase=False)
+
+    def reset_stepgen_offset(self):
+        # always written, the offset can be changed from the front panel
+        self._set_property("stepgen_offset", self.STEPGEN_MIN_OFFSET, force=True)
+
+    def set_stepgen_offset(self, offset):
+        self._set_property("stepgen_offset", offset)
+
+    def get_stepgen_offset(self):
+        return self._get_property("stepgen_offset")
+
+    def change_stepgen_offset(self, delta=0.1, limit=10, increase=True):
+        offset = self.get_stepgen_offset()
+        r_offset = round(offset, 2)
+
+        abs_limit_value = abs(limit)
+        if -abs_limit_value >= r_offset or r_offset >= abs_limit_value:
+            return
+
+        step = self.get_stepgen_step_size()
+        min_delta = - self.STEPGEN_OFFSET_RESOLUTION * step
+        min_delta = max(round(min_delta, ndigits=3), abs(delta))
+        if not increase:
+            min_delta = - min_delta
+        self.set_stepgen_offset(offset + min_delta)
+        log.debug("stepgen offset now %s", offset + min_delta)
+
+    def vary_stepgen_offset(self, delta=0.1, limit=10):
+        """
+        Changes the step generator offset following the variation which can be negative.
+        :param delta: the amount of variaton
+        :param limit: the -limit, limit imposed to the minimum or maximun value
+        that the offset can reach.
+        :return: None
+        """
+        if delta <= 0:
+            self.change_stepgen_offset(delta, limit, increase=False)
+        else:
+            self.change_stepgen_offset(delta, limit, increase=True)
+
+    def reset_stepgen_step_size(self):
+        stepgen_sizes = self.get_valid_stepgen_step_sizes()
+        self.set_stepgen_step_size(stepgen_sizes[0])
+
+    def set_stepgen_step_size(self, step_size):
+        stepgen_source = self._get_property("stepgen_step_source_and_size")[0]
+        self._set_property("stepgen_step_source_and_size", (stepgen_source, step_size))
+
+    def get_stepgen_step_size(self):
+        return self._get_property("stepgen_step_source_and_size")[1]
+
+    def change_stepgen_step_size(self, increase=True):
+        """
+        changes the actual value of the step size in the step generator
+        :param increase: if increase is True then the step size in the step generator will raise.
+        Otherwise will decrease.
+        :return: None
+        """
+        new_step_size = self._shifted_valid_selection("stepgen",
+                                                      self.get_stepgen_step_size(),
+                                                      1 if increase else -1)
+        if new_step_size is not None:
+            self.set_stepgen_step_size(new_step_size)
+
+    def increase_stepgen_step_size(self):
+        self.change_stepgen_step_size(increase=True)
+
+    def decrease_stepgen_step_size(self):
+        self.change_stepgen_step_size(increase=False)
+
+    def get_valid_stepgen_step_sizes(self):
+        return self._valid_selections[self._load_valid_selections("stepgen")]
+
+    def set_stepgen_source(self, stepgen_source):
+        stepgen_sizes = self._valid_selections[self._load_valid_selections("stepgen", stepgen_source)]
+        self._set_property("stepgen_step_source_and_size", (stepgen_source, stepgen_sizes[0]))
+
+    def get_horizontal_source(self):
+        return self._get_property("display_horizontal_source_sensitivity")[0]
+
+    def get_vertical_source(self):
+        return self._get_property("display_vertical_source_sensitivity")[0]
+
+    def get_stepgen_source(self):
+        return self._get_property("stepgen_step_source_and_size")[0]
+
+    def get_current_readout(self):
+        self.flush()
+        return self.concrete_tek_ct.crt_readout_v
+
+    def get_voltage_readout(self):
+        self.flush()
+        return self.concrete_tek_ct.crt_readout_h
+
+    def read_cursors(self):
+        """
+        reads both cursor readouts with a single READOUT? query, answered as
+        READOUT <vertical>,<horizontal>
+        :return: the (voltage, current) cursor readouts, horizontal first
+        """
+        self.flush()
+        reply = self.concrete_tek_ct.ask(self._command("cursor_readouts"))
+        vertical, horizontal = reply.strip().split(" ")[-1].split(",")[-2:]
+        return float(horizontal), float(vertical)
+
+    def t(self):
+        print(self.concrete_tek_ct.display_horizontal_source_sensitivity)
+        print(self.concrete_tek_ct.display_vertical_source_sensitivity)
+
+    def wait_for_settling(self, settling_time=None):
+        """
+        flushes the pending writes and gives the instrument settling_time seconds to apply them and
+        to update the crt readouts. The 371A does not report the completion of a setting change
+        (there is no *OPC? in its command set and it only requests service at the end of a sweep),
+        so a fixed delay is the only option.
+        :param settling_time: the delay in s, SETTLING_TIME when None
+        :return: None
+        """
+        self.flush()
+        time.sleep(self.SETTLING_TIME if settling_time is None else settling_time)
+
+    def activate_srq(self):
+        self.flush()
+        self.concrete_tek_ct.enable_srq_event()
+
+    def wait_for_srq(self):
+        self.flush()
+        self.concrete_tek_ct.wait_for_srq()
+
+    def start_sweep(self):
+        self._set_property("measure_mode", "SWEep")
+
+    def get_curve(self):
+        self.flush()
+        # the curve is a binary block that may hold termination characters, read until EOI
+        with self.concrete_tek_ct.adapter.connection.read_termination_context(""):
+            return self.concrete_tek_ct.get_curve()
+
+    def sweep_and_fetch(self, collector_supply=None, h_sensitivity=None, v_sensitivity=None,
+                        n_points=None):
+        """
+        runs a hardware sweep and reads the whole curve at once. The given settings and the
+        command that starts the sweep are sent in a single compound message, the settings left as
+        None are not changed.
+        :param collector_supply: the collector supply (in %) for the sweep
+        :param h_sensitivity: the horizontal sensitivity for the sweep
+        :param v_sensitivity: the vertical sensitivity for the sweep
+        :param n_points: the number of points of the curve
+        :return: numpy array with the (x, y) points of the curve
+        """
+        if n_points is not None:
+            self.set_number_of_curve_points(n_points)
+        self.activate_srq()
+        with self.staged_writes():
+            if collector_supply is not None:
+                self.set_collector_suplly(collector_supply)
+            if h_sensitivity is not None:
+                self.set_horizontal_sensitivity(h_sensitivity)
+            if v_sensitivity is not None:
+                self.set_vertical_sensitivity(v_sensitivity)
+            self.start_sweep()
+        try:
+            self.wait_for_srq()
+            curve = self.get_curve()
+        finally:
+            self.concrete_tek_ct.discard_and_disable_all_events()
+        return np.asarray(curve.points)
+
+    def set_number_of_curve_points(self, n):
+        self._set_property("waveform_points", n)
+
+
+class RangeAutoScaler:
+    """ Keeps the display ranges of a TektronixCurveTracer just above the cursor readouts
+    while a sweep is being prepared.
+
+    The valid ranges are computed once from the valid sensitivities, so every decision is
+    a bisect over local data and at most one write to the instrument.
+
+    .. code-block:: python
+
+    scaler = RangeAutoScaler(tct, v_max=5, i_max=10)
+    scaler.update(v_cursor, i_cursor)
+
+    """
+
+    def __init__(self, tct, v_max, i_max):
+        """
+        :type tct:TektronixCurveTracer
+        :param v_max: the horizontal range is not increased for readouts beyond this voltage
+        :param i_max: the vertical range is not increased for readouts beyond this current
+        """
+        self.tct = tct
+        self.v_max = abs(v_max)
+        self.i_max = abs(i_max)
+        self._h_sensitivities = tct.get_valid_horizontal_sensitivities()
+        self._v_sensitivities = tct.get_valid_vertical_sensitivities()
+        self._h_ranges = [s * tct.N_HORIZONTAL_DIVS for s in self._h_sensitivities]
+        self._v_ranges = [s * tct.N_VERTICAL_DIVS for s in self._v_sensitivities]
+        self._h_idx = tct._index_of_valid_selection("horizontal", tct.get_horizontal_sensitivity())
+        self._v_idx = tct._index_of_valid_selection("vertical", tct.get_vertical_sensitivity())
+
+    @staticmethod
+    def _next_index(ranges, index, cursor, limit):
+        """
+        :return: the index of the smallest range that holds the cursor, never lower than index.
+        The index does not change if the cursor is already inside the range or beyond the limit.
+        """
+        if not ranges[index] < cursor < limit:
+            return index
+        return max(index, min(bisect.bisect_left(ranges, cursor), len(ranges) - 1))
+
+    def update(self, v_cursor, i_cursor):
+        """
+        increases the horizontal and/or vertical ranges of the curve tracer if the readouts
+        are out of them.
+        :param v_cursor: the voltage cursor readout
+        :param i_cursor: the current cursor readout
+        :return: None
+        """
+        h_idx = self._next_index(self._h_ranges, self._h_idx, abs(v_cursor), self.v_max)
+        v_idx = self._next_index(self._v_ranges, self._v_idx, abs(i_cursor), self.i_max)
+        if h_idx != self._h_idx and v_idx != self._v_idx:
+            self.tct.set_horizontal_and_vertical_sensitivity(self._h_sensitivities[h_idx],
+                                                             self._v_sensitivities[v_idx])
+        elif h_idx != self._h_idx:
+            self.tct.set_horizontal_sensitivity(self._h_sensitivities[h_idx])
+        elif v_idx != self._v_idx:
+            self.tct.set_vertical_sensitivity(self._v_sensitivities[v_idx])
+        self._h_idx = h_idx
+        self._v_idx = v_idx